@@ -1,8 +1,10 @@
+import os
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 import shin  # https://github.com/mberk/shin
-from scipy.stats import poisson
 
 
 class OddsProbsConverter(ABC):
@@ -11,6 +13,22 @@ class OddsProbsConverter(ABC):
     def odds_to_probs(self, odds: list) -> list:
         pass
 
+    def probs_grouped(self, odds: np.ndarray, codes: np.ndarray, ngroups: int) -> np.ndarray:
+        """
+        Converts odds to probabilities for many groups (games) at once - by default group by group
+
+        :param odds: array of odds for all exact results of all games
+        :param codes: array of group codes (0..ngroups-1) aligned with odds
+        :param ngroups: number of groups
+        :return: array of probabilities aligned with odds
+        """
+        order = np.argsort(codes, kind='stable')
+        group_bounds = np.cumsum(np.bincount(codes, minlength=ngroups))[:-1]
+        probs = np.empty(len(odds))
+        probs[order] = np.concatenate([self.odds_to_probs(group_odds)
+                                       for group_odds in np.split(odds[order], group_bounds)])
+        return probs
+
 
 class NaiveOddsProbsConverter(OddsProbsConverter):
 
@@ -19,135 +37,347 @@ class NaiveOddsProbsConverter(OddsProbsConverter):
         sum_inv_odds = sum(inv_odds)
         return [x / sum_inv_odds for x in inv_odds]
 
+    def probs_grouped(self, odds: np.ndarray, codes: np.ndarray, ngroups: int) -> np.ndarray:
+        inv_odds = 1.0 / odds
+        sum_inv_odds = np.bincount(codes, weights=inv_odds, minlength=ngroups)
+        return inv_odds / sum_inv_odds[codes]
+
 
 class ShinOddsProbsConverter(OddsProbsConverter):
 
+    def __init__(self, max_iterations: int = 1000, convergence_threshold: float = 1e-12):
+        self.max_iterations = max_iterations
+        self.convergence_threshold = convergence_threshold
+
     def odds_to_probs(self, odds: list) -> list:
         odds_list = [x for x in odds]  # if pd.Series is passed
-        return shin.calculate_implied_probabilities(odds_list)['implied_probabilities']
+        return shin.calculate_implied_probabilities(odds_list,
+                                                    max_iterations=self.max_iterations,
+                                                    convergence_threshold=self.convergence_threshold
+                                                    )['implied_probabilities']
+
+    def probs_grouped(self, odds: np.ndarray, codes: np.ndarray, ngroups: int) -> np.ndarray:
+        """
+        Shin's method solved for all groups (games) at once - the same fixed-point iteration for z (the proportion
+        of insider trading) as in the shin package, but each iteration is a single pass over the whole odds array
+        """
+        n = np.bincount(codes, minlength=ngroups)
+        if np.any(n < 2):
+            raise ValueError('len(odds) must be >= 2 for each group')
+        if np.any(odds < 1):
+            raise ValueError('All odds must be >= 1')
+
+        inv_odds = 1.0 / odds
+        sum_inv_odds = np.bincount(codes, weights=inv_odds, minlength=ngroups)
+        scaled_sq_inv_odds = inv_odds ** 2 / sum_inv_odds[codes]
+
+        # Two outcomes - closed form solution (only squared difference of inverse odds matters, so order is irrelevant)
+        is_pair = n == 2
+        is_first = np.zeros(len(odds), dtype=bool)
+        is_first[np.unique(codes, return_index=True)[1]] = True
+        sq_diff_inv_odds = np.bincount(codes, weights=np.where(is_first, inv_odds, -inv_odds), minlength=ngroups) ** 2
+        z = np.zeros(ngroups)
+        z[is_pair] = ((sum_inv_odds[is_pair] - 1) * (sq_diff_inv_odds[is_pair] - sum_inv_odds[is_pair])) / \
+                     (sum_inv_odds[is_pair] * (sq_diff_inv_odds[is_pair] - 1))
+
+        # More outcomes - fixed-point iteration, converged groups are no longer updated
+        is_active = ~is_pair
+        iterations = 0
+        while is_active.any() and iterations < self.max_iterations:
+            z_codes = z[codes]
+            sum_sqrt = np.bincount(codes, weights=np.sqrt(z_codes ** 2 + 4 * (1 - z_codes) * scaled_sq_inv_odds),
+                                   minlength=ngroups)
+            z_new = np.where(is_active, (sum_sqrt - 2) / np.where(is_pair, 1, n - 2), z)
+            is_active = is_active & (np.abs(z_new - z) > self.convergence_threshold)
+            z = z_new
+            iterations += 1
+
+        z_codes = z[codes]
+        return (np.sqrt(z_codes ** 2 + 4 * (1 - z_codes) * scaled_sq_inv_odds) - z_codes) / (2 * (1 - z_codes))
 
 
 def _add_basic_cols_to_games_df(df: pd.DataFrame):
     df['goals_diff'] = df['home_goals'] - df['away_goals']
     df['num_goals'] = df['home_goals'] + df['away_goals']
-    df['winner'] = np.where(df['goals_diff'] > 0, 'home',
-                            np.where(df['goals_diff'] < 0, 'away',
-                                     np.where(df['home_goals'] >= 0, 'draw',
-                                              None)))
-    df['is_draw'] = np.where(df['winner'] == 'draw', True, False)
+    # Winner encoded as int8 code: 0 = home, 1 = draw, 2 = away, -1 = unknown (for 'other' final result)
+    df['winner'] = np.where(df['home_goals'].to_numpy() >= 0,
+                            1 - np.sign(df['goals_diff'].to_numpy()),
+                            -1).astype(np.int8)
+    df['is_draw'] = df['winner'] == 1
     return df
 
-def prepare_games_df(parsed_games: list,
+def _apply_ot_adj_to_games_df(df: pd.DataFrame,
+                              ngames: int,
+                              max_num_goals_ot_sd: float = 6.0,
+                              min_prob_ot: float = 1e-9) -> pd.DataFrame:
+    """
+    Adjusts probabilities to reflect the exact result after potential overtime (30 minutes OT) - draws after 90min FT
+    are extended with exact results of OT modeled with Poisson distribution of the total number of goals.
+
+    :param df: data frame with odds and probabilities - one row = one exact result of one game (game_id = 0..ngames-1)
+    :param ngames: number of games
+    :param max_num_goals_ot_sd: OT results with # goals above lambda + max_num_goals_ot_sd * sqrt(lambda) are skipped
+    :param min_prob_ot: OT results with probability below min_prob_ot are skipped
+    :return: data frame with the same columns and one row per each exact result after FT + potential OT
+    """
+    game_codes = df['game_id'].to_numpy()
+    home_goals = df['home_goals'].to_numpy()
+    num_goals = df['num_goals'].to_numpy()
+    prob = df['prob'].to_numpy()
+
+    # Maximum number of goals - to overwrite artificial negative # goals for 'other' final result with max + 1
+    max_num_goals = np.full(ngames, -1)
+    np.maximum.at(max_num_goals, game_codes, num_goals)
+    num_goals = np.where(num_goals < 0, max_num_goals[game_codes] + 1, num_goals)
+
+    # Distribution of the total number of goals after 90min full time (one row per game)
+    prob_num_goals = np.zeros((ngames, num_goals.max() + 1))
+    np.add.at(prob_num_goals, (game_codes, num_goals), prob)
+
+    # Calculating avg total number of goals in 90 min FT per each game
+    # i.e. lambda parameter in Poisson distribution fitted to actual total goals in 90mins distribution
+    ev_num_goals_ft = prob_num_goals @ np.arange(prob_num_goals.shape[1])
+
+    # Modeling # of goals in overtime with Poisson distribution.
+    # Lambda parameter for OT should be 1/3 of the lambda parameter for FT
+    # (because 30min OT = 33% of 90min FT and we assume equal avg goals frequency in FT & OT)
+    ev_num_goals_ot = ev_num_goals_ft / 3.0
+    # Poisson pmf from a log-factorial table: exp(-lambda + k * log(lambda) - log(k!))
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, prob_num_goals.shape[1])))])
+    ev_num_goals_ot_rows = ev_num_goals_ot[game_codes]
+    # k * log(lambda) taken as 0 for k = 0 (incl. lambda = 0, e.g. 0:0 as the only quoted result), as in poisson.pmf
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k_log_lambda = np.where(num_goals == 0, 0.0, num_goals * np.log(ev_num_goals_ot_rows))
+    poisson_prob_ot = np.exp(-ev_num_goals_ot_rows + k_log_lambda - log_factorial[num_goals])
+
+    # Exact results of OT: probability of # goals in OT split between the exact results with the same # goals
+    # proportionally to FT probabilities ('other' final result can't be an OT result).
+    # Negligible OT results (far Poisson tail or tiny probability) are skipped before duplicating draw rows below,
+    # except for OT results with no goals (i.e. FT draw stands).
+    prob_ot = prob * poisson_prob_ot / prob_num_goals[game_codes, num_goals]
+    max_num_goals_ot = np.ceil(ev_num_goals_ot + max_num_goals_ot_sd * np.sqrt(ev_num_goals_ot))
+    is_ot = (home_goals >= 0) & \
+            ((num_goals == 0) | ((num_goals <= max_num_goals_ot[game_codes]) & (prob_ot >= min_prob_ot)))
+    df_ot = pd.DataFrame({'game_id': game_codes[is_ot],
+                          'home_goals_ot': home_goals[is_ot],
+                          'away_goals_ot': df['away_goals'].to_numpy()[is_ot],
+                          'prob_ot': prob_ot[is_ot]})
+
+    # Updating draw FT exact results with possible OT-only exact results.
+    # (Duplication of rows since e.g. 1:0 might be reached after FT OR after 0:0 in FT and 1:0 in OT)
+    # Draws of games without any OT result left (e.g. 0:0 not quoted) are kept as they are after FT.
+    is_draw = df['is_draw'].to_numpy()
+    df_draw_ot = df[is_draw].merge(df_ot, on='game_id', how='left'). \
+        fillna({'home_goals_ot': 0, 'away_goals_ot': 0, 'prob_ot': 1.0}). \
+        astype({'home_goals_ot': 'int8', 'away_goals_ot': 'int8'})
+    df_draw_ot['home_goals'] = df_draw_ot['home_goals'] + df_draw_ot['home_goals_ot']
+    df_draw_ot['away_goals'] = df_draw_ot['away_goals'] + df_draw_ot['away_goals_ot']
+    df_draw_ot['prob'] = df_draw_ot['prob'] * df_draw_ot['prob_ot']
+    df_ft_ot = pd.concat([df[~is_draw], df_draw_ot[df.columns]])
+
+    # Aggregating per exact game result after FT + potential OT (i.e. removing the above duplication)
+    df_ft_ot_agg = df_ft_ot.groupby(['game_id', 'home_goals', 'away_goals'], sort=False, as_index=False)['prob'].sum()
+
+    # Collecting the final games dataframe (home, away & date&time taken from the first row of each game).
+    # Note: more possible results will show up here than without OT adjustment (i.e. more rows)
+    # e.g. 4:3 is not quoted by a bookie but it will appear as a consequence of 3:3 after 90 minutes + 1:0 in OT.
+    df_res = df_ft_ot_agg.merge(df[['game_id', 'home_goals', 'away_goals', 'odds']],
+                                on=['game_id', 'home_goals', 'away_goals'],
+                                how='left')
+    game_rows = np.unique(game_codes, return_index=True)[1][df_res['game_id'].to_numpy()]
+    df_res = df_res.assign(home=df['home'].array.take(game_rows),
+                           away=df['away'].array.take(game_rows),
+                           game_datetime=df['game_datetime'].array.take(game_rows))
+    return _add_basic_cols_to_games_df(df_res)[df.columns].astype({'home_goals': 'int8', 'away_goals': 'int8'})
+
+
+def prepare_games_df(parsed_games: dict,
                      odds_converter: OddsProbsConverter = NaiveOddsProbsConverter(),
                      apply_ot_adj: bool = False) -> pd.DataFrame:
     """
     Cleans the data frame with odds by removing negative odds values and adds additional columns for convenience
-    e.g. difference in home/away goals scored, winner (i.e. home, away or draw), probability.
+    e.g. integer game id, difference in home/away goals scored, winner (i.e. home, away or draw), probability.
 
-    :param parsed_games: list of parsed odds - one item = one exact result of one game (e.g. Poland-Mexico 1:0)
+    :param parsed_games: dictionary of columns with parsed odds - one item = one exact result of one game
+    (e.g. Poland-Mexico 1:0)
     :param odds_converter: Converter from odds to probabilities (naive or Shin)
     :param apply_ot_adj: should probabilities be adjusted to reflect the exact result after potential overtime (30 minutes OT)
 
     :return: data frame with odds and additional columns - one row = one exact result of one game (e.g. Poland-Mexico 1:0)
     """
     df = pd.DataFrame(parsed_games)
-    df = df[df['odds'] >= 0.0]
+    # Goals are int8 already when parsed with parse_games - cast kept for other sources of parsed games
+    df = df[df['odds'] >= 0.0].astype({'home': 'category', 'away': 'category',
+                                       'home_goals': 'int8', 'away_goals': 'int8'})
     df = _add_basic_cols_to_games_df(df)
-    df['prob'] = df.groupby(['home', 'away']).odds.transform(odds_converter.odds_to_probs)
+    # Integer game id (0..# games - 1) used as the only grouping key from here on.
+    # A game is (home, away, game_datetime) - the same fixture on two dates is two games, normalised separately.
+    game_ids, games = pd.factorize(pd.MultiIndex.from_arrays([df['home'], df['away'], df['game_datetime']]))
+    df['game_id'] = game_ids.astype(np.int32)
+    df['prob'] = odds_converter.probs_grouped(df['odds'].to_numpy(), game_ids, len(games))
 
     if apply_ot_adj:
-        # Distribution of the total number of goals after 90min full time
-        df_num_goals = df.groupby(['home', 'away', 'num_goals'], as_index=False). \
-            agg({'prob': ['sum']}). \
-            droplevel(axis=1, level=1)
-        # Maximum number of goals - to overwrite artificial negative # goals for 'other' final result with max + 1
-        df_max_num_goals = df_num_goals.groupby(['home', 'away'], as_index=False). \
-            agg({'num_goals': ['max']}). \
-            droplevel(axis=1, level=1)
-        df_num_goals = df_num_goals.merge(df_max_num_goals, on=['home', 'away'], suffixes=['', '_max'])
-        df_num_goals['num_goals'] = np.where(df_num_goals['num_goals'] < 0,
-                                             df_num_goals['num_goals_max'] + 1,
-                                             df_num_goals['num_goals'])
-
-        # Calculating avg total number of goals in 90 min FT per each game
-        # i.e. lambda parameter in Poisson distribution fitted to actual total goals in 90mins distribution
-        df_num_goals['ev_num_goals'] = df_num_goals['num_goals'] * df_num_goals['prob']
-        df_ev_num_goals = df_num_goals.groupby(['home', 'away'], as_index=False). \
-            agg({'ev_num_goals': ['sum']}). \
-            droplevel(axis=1, level=1)
-        df_num_goals = df_num_goals.merge(df_ev_num_goals, on=['home', 'away'], suffixes=['', '_ft'])
-
-        # Modeling # of goals in overtime with Poisson distribution.
-        # Lambda parameter for OT should be 1/3 of the lambda parameter for FT
-        # (because 30min OT = 33% of 90min FT and we assume equal avg goals frequency in FT & OT)
-        df_num_goals['ev_num_goals_ot'] = df_num_goals['ev_num_goals_ft'] / 3.0
-        df_num_goals['poisson_prob_ft'] = poisson.pmf(df_num_goals['num_goals'], df_num_goals['ev_num_goals_ft'])
-        df_num_goals['poisson_prob_ot'] = poisson.pmf(df_num_goals['num_goals'], df_num_goals['ev_num_goals_ot'])
-
-        # Updating draw FT exact results with possible OT-only exact results.
-        # (Duplication of rows since e.g. 1:0 might be reached after FT OR after 0:0 in FT and 1:0 in OT)
-        df_ot = df.merge(df_num_goals, on=['home', 'away', 'num_goals'], how='left', suffixes=['', '_num_goals'])
-        df_ot['prob'] = df_ot['prob'] * df_ot['poisson_prob_ot'] / df_ot['prob_num_goals']
-        df_ot['is_draw'] = True
-        df_ft_ot = df.merge(df_ot, on=['home', 'away', 'is_draw'], how='left', suffixes=['', '_ot'])
-        df_ft_ot['home_goals_ft_ot'] = np.where(df_ft_ot['is_draw'],
-                                                df_ft_ot['home_goals'] + df_ft_ot['home_goals_ot'],
-                                                df_ft_ot['home_goals'])
-        df_ft_ot['away_goals_ft_ot'] = np.where(df_ft_ot['is_draw'],
-                                                df_ft_ot['away_goals'] + df_ft_ot['away_goals_ot'],
-                                                df_ft_ot['away_goals'])
-
-        df_ft_ot['prob_ft_ot'] = np.where(df_ft_ot['is_draw'],
-                                          df_ft_ot['prob'] * df_ft_ot['prob_ot'],
-                                          df_ft_ot['prob'])
-
-        # Aggregating per exact game result after FT + potential OT (i.e. removing the above duplication)
-        df_ft_ot_agg = df_ft_ot.groupby(['home', 'away', 'game_datetime', 'home_goals_ft_ot', 'away_goals_ft_ot'], as_index=False). \
-            agg({'prob_ft_ot': ['sum']}). \
-            droplevel(axis=1, level=1). \
-            rename(columns={'home_goals_ft_ot': 'home_goals',
-                            'away_goals_ft_ot': 'away_goals',
-                            'prob_ft_ot': 'prob'})
-
-        # Collecting the final games dataframe.
-        # Note: more possible results will show up here than without OT adjustment (i.e. more rows)
-        # e.g. 4:3 is not quoted by a bookie but it will appear as a consequence of 3:3 after 90 minutes + 1:0 in OT.
-        df_res = df_ft_ot_agg.merge(df, on=['home', 'away', 'home_goals', 'away_goals'],
-                                    how='left',
-                                    suffixes=['', '_ft'])
-        df_res = _add_basic_cols_to_games_df(df_res)[df.columns].astype({'home_goals': 'int32', 'away_goals': 'int32'})
-    else:
-        df_res = df
-
-    return df_res
+        df = _apply_ot_adj_to_games_df(df, len(games))
+
+    # Rows sorted by game, so that each game is a contiguous block of rows (see _game_offsets)
+    return df.sort_values('game_id', kind='stable').reset_index(drop=True)
+
+
+def _game_offsets(game_ids: np.ndarray) -> np.ndarray:
+    """
+    Finds the boundaries of games in rows sorted by game_id (0..# games - 1) with a single binary search
+
+    :param game_ids: sorted array of game ids
+    :return: array with the first row of each game followed by the total number of rows
+    """
+    ngames = game_ids[-1] + 1 if len(game_ids) > 0 else 0
+    return np.searchsorted(game_ids, np.arange(ngames + 1))
+
+
+def _sorted_by_game_id(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns df with rows (stably) sorted by game_id - as is if already sorted (e.g. from prepare_games_df)"""
+    game_ids = df['game_id'].to_numpy()
+    return df if np.all(game_ids[:-1] <= game_ids[1:]) else df.sort_values('game_id', kind='stable')
+
+
+def _points_ev_kernel(home_goals: np.ndarray,
+                      away_goals: np.ndarray,
+                      goals_diff: np.ndarray,
+                      winner: np.ndarray,
+                      prob: np.ndarray,
+                      offsets: np.ndarray,
+                      points_per_exact: float,
+                      points_per_goal_diff: float,
+                      points_per_winner: float) -> np.ndarray:
+    """
+    Calculates the EV of points for every bet of all games at once, pairing each bet only with the real exact
+    results of the same game
+
+    :param home_goals: array with one item per each game & exact result pair, rows sorted by game (same for the rest)
+    :param away_goals: array of away goals
+    :param goals_diff: array of goals differences
+    :param winner: array of winner codes
+    :param prob: array of probabilities
+    :param offsets: array with the first row of each game followed by the total number of rows
+    :param points_per_exact: Points for hitting the exact game result
+    :param points_per_goal_diff: Points for hitting the exact goals difference only (home - away)
+    :param points_per_winner: Points for hitting the game winner only
+    :return: array with the EV of points per each bet (row)
+    """
+    game_sizes = np.diff(offsets)
+    # Each bet (row) is paired with all rows of its game, i.e. with game size real exact results
+    row_sizes = np.repeat(game_sizes, game_sizes)
+    row_game_starts = np.repeat(offsets[:-1], game_sizes)
+    pair_starts = np.cumsum(row_sizes) - row_sizes
+    bet_idx = np.repeat(np.arange(len(prob)), row_sizes)
+    real_idx = np.arange(row_sizes.sum()) - np.repeat(pair_starts - row_game_starts, row_sizes)
+
+    exact_result_hit = (home_goals[bet_idx] == home_goals[real_idx]) & \
+                       (away_goals[bet_idx] == away_goals[real_idx])
+    goal_diff_hit = goals_diff[bet_idx] == goals_diff[real_idx]
+    winner_hit = winner[bet_idx] == winner[real_idx]
+
+    points = np.where(exact_result_hit, points_per_exact,
+                      np.where(goal_diff_hit, points_per_goal_diff,
+                               np.where(winner_hit, points_per_winner,
+                                        0.0)))
+    return np.bincount(bet_idx, weights=points * prob[real_idx], minlength=len(prob))
 
 
 def analyze_games_df(games_df: pd.DataFrame,
                      points_per_exact: float = 4.0,
                      points_per_goal_diff: float = 2.0,
-                     points_per_winner: float = 1.0) -> pd.DataFrame:
+                     points_per_winner: float = 1.0,
+                     max_workers: Optional[int] = None) -> pd.DataFrame:
     """
-    For each game cross joins each possible exact result bet with each possible real outcome
-    and calculates potential points gained per bet
+    For each game compares each possible exact result bet with each possible real outcome (without cross joining
+    the data frame), assigns potential # points gained and calculates the EV of every bet
 
-    :param games_df: Pandas dataframe with one row per each game & exact result pair
+    :param games_df: Pandas dataframe with one row per each game & exact result pair, as returned by prepare_games_df
+    (game_id must be dense, i.e. 0..# games - 1; rows are sorted by game_id here if they aren't already)
     :param points_per_exact: Points for hitting the exact game result
     :param points_per_goal_diff: Points for hitting the exact goals difference only (home - away)
     :param points_per_winner: Points for hitting the game winner only
-    :return: Pandas dataframe with every combination of a bet and real exact result of each game
-    with assigned potential # points gained and its contribution to EV (# points x probability)
+    :param max_workers: Number of threads processing chunks of games in parallel (number of CPUs by default)
+    :return: Pandas dataframe with one row per each game & exact result bet
+    with its EV of points gained (sum of # points x probability over all real exact results)
+    """
+    games_df = _sorted_by_game_id(games_df)
+    offsets = _game_offsets(games_df['game_id'].to_numpy())
+    ngames = len(offsets) - 1
+    home_goals = games_df['home_goals'].to_numpy()
+    away_goals = games_df['away_goals'].to_numpy()
+    goals_diff = games_df['goals_diff'].to_numpy()
+    winner = games_df['winner'].to_numpy()
+    prob = games_df['prob'].to_numpy()
+
+    def points_ev_of_games(first_game: int, last_game: int) -> np.ndarray:
+        rows = slice(offsets[first_game], offsets[last_game])
+        return _points_ev_kernel(home_goals=home_goals[rows],
+                                 away_goals=away_goals[rows],
+                                 goals_diff=goals_diff[rows],
+                                 winner=winner[rows],
+                                 prob=prob[rows],
+                                 offsets=offsets[first_game:last_game + 1] - offsets[first_game],
+                                 points_per_exact=points_per_exact,
+                                 points_per_goal_diff=points_per_goal_diff,
+                                 points_per_winner=points_per_winner)
+
+    # Games are independent - contiguous chunks of games are processed in parallel threads
+    # (threads rather than processes, since NumPy releases the GIL and nothing has to be pickled)
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_bounds = np.linspace(0, ngames, max(1, min(max_workers, ngames)) + 1).astype(int)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        points_ev_chunks = list(executor.map(points_ev_of_games, chunk_bounds[:-1], chunk_bounds[1:]))
+
+    results_df = games_df[['game_id', 'home', 'away', 'game_datetime', 'home_goals', 'away_goals']].\
+        rename(columns={'home_goals': 'home_goals_bet', 'away_goals': 'away_goals_bet'})
+    results_df['points_EV'] = np.concatenate(points_ev_chunks)
+    return results_df
+
+
+def _ordinal(n: int) -> str:
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f'{n}{suffix}'
+
+
+def pick_top_bets(results_df: pd.DataFrame, top_n: int = 3) -> pd.DataFrame:
     """
-    cross_df = games_df.merge(games_df, on=['home', 'away', 'game_datetime'], suffixes=['_bet', '_real'])
+    Picks top N bets with the highest EV of points per each game (partial sort within each game only)
 
-    exact_result_hit = (cross_df['home_goals_bet'] == cross_df['home_goals_real']) & \
-                       (cross_df['away_goals_bet'] == cross_df['away_goals_real'])
-    goal_diff_hit = cross_df['goals_diff_bet'] == cross_df['goals_diff_real']
-    winner_hit = cross_df['winner_bet'] == cross_df['winner_real']
+    :param results_df: Pandas dataframe with one row per each game & exact result bet with its EV (points_EV),
+    as returned by analyze_games_df (game_id must be dense, i.e. 0..# games - 1, as produced by prepare_games_df;
+    rows are sorted by game_id here if they aren't already)
+    :param top_n: Number of bets to pick per each game
+    :return: Pandas dataframe with one row per each game (with at least N bets): home, away, game_datetime
+    and home_goals_bet, away_goals_bet, points_EV of each of top N bets suffixed with their rank (e.g. points_EV_1st)
+    """
+    results_df = _sorted_by_game_id(results_df)
+    offsets = _game_offsets(results_df['game_id'].to_numpy())
+    home_goals = results_df['home_goals_bet'].to_numpy()
+    away_goals = results_df['away_goals_bet'].to_numpy()
+    points_ev = results_df['points_EV'].to_numpy()
 
-    cross_df['points'] = np.where(exact_result_hit, points_per_exact,
-                                  np.where(goal_diff_hit, points_per_goal_diff,
-                                           np.where(winner_hit, points_per_winner,
-                                                    0.0)))
+    # One row per game: home goals, away goals & EV of the 1st bet, then of the 2nd bet etc.
+    top_bets = np.empty((len(offsets) - 1, 3 * top_n))
+    has_top_n = np.diff(offsets) >= top_n
+    for game, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        if not has_top_n[game]:
+            continue
+        game_points_ev = points_ev[start:end]
+        game_top_idx = np.argpartition(-game_points_ev, top_n - 1)[:top_n]
+        game_top_idx = start + game_top_idx[np.argsort(-game_points_ev[game_top_idx], kind='stable')]
+        top_bets[game, 0::3] = home_goals[game_top_idx]
+        top_bets[game, 1::3] = away_goals[game_top_idx]
+        top_bets[game, 2::3] = points_ev[game_top_idx]
 
-    cross_df['points_EV'] = cross_df['points'] * cross_df['prob_real']
-    return cross_df
+    ranks = [_ordinal(rank) for rank in range(1, top_n + 1)]
+    top_bets_df = pd.DataFrame(top_bets[has_top_n],
+                               columns=[f'{col}_{rank}' for rank in ranks
+                                        for col in ['home_goals_bet', 'away_goals_bet', 'points_EV']]). \
+        astype({f'{col}_{rank}': int for rank in ranks for col in ['home_goals_bet', 'away_goals_bet']})
+    game_first_rows = offsets[:-1][has_top_n]
+    top_bets_df.insert(0, 'home', results_df['home'].array.take(game_first_rows))
+    top_bets_df.insert(1, 'away', results_df['away'].array.take(game_first_rows))
+    top_bets_df.insert(2, 'game_datetime', results_df['game_datetime'].array.take(game_first_rows))
+    return top_bets_df
@@ -1,14 +1,17 @@
 from utils import safe_cast
 import bs4
+import numpy as np
+import pandas as pd
+from array import array
 from datetime import datetime
 
 
-def parse_single_odds(single_odds_node: bs4.element.Tag) -> dict:
+def parse_single_odds(single_odds_node: bs4.element.Tag) -> tuple:
     """
     Parses a html node with odds for a single result (e.g. 1:0 6.90)
 
     :param single_odds_node: A html node with one exact result and its odds
-    :return: e.g. {'home_goals': 1, 'away_goals': 0, 'odds': 6.9}
+    :return: (home goals, away goals, odds) e.g. (1, 0, 6.9)
     """
     odds_node = single_odds_node.find('span', attrs={'class': 'odds-value'})
     result_node = single_odds_node.find('span', attrs={'class': 'odds-name'})
@@ -20,44 +23,69 @@ def parse_single_odds(single_odds_node: bs4.element.Tag) -> dict:
         home_goals = -1
         away_goals = -1
 
-    return {'home_goals': home_goals, 'away_goals': away_goals, 'odds': odds}
+    return home_goals, away_goals, odds
 
 
-def parse_odds(odds_node: bs4.element.Tag) -> list:
+def parse_game_name(game_name_node: bs4.element.Tag) -> tuple:
     """
-    Parses multiple exact results & odds for a single game
-    :param odds_node: A html node with nested nodes with individual exact results and its odds
-    :return: A list of dictionaries (single item = result of parse_single_odds)
+    Parses a html node with the name of a single game (e.g. Poland - Mexico)
+
+    :param game_name_node: A html node with home & away teams
+    :return: (home, away) e.g. ('Poland', 'Mexico')
     """
-    return [parse_single_odds(single_odds_node) for single_odds_node in odds_node.findAll('a')]
+    home, away = [x.strip() for x in game_name_node.text.strip().split('-')]
+    return home, away
 
 
-def parse_game(game_node: bs4.element.Tag) -> list:
-    """
-    Extracts all relevant info about a single game: home&away teams, date&time, all quoted exact game results with odds
-    :param game_node: A html node with all the data about a single game
-    :return: A list of dictionaries with one item per each exact result quoted
+def parse_game_datetimes(game_datetime_strs: list) -> np.ndarray:
     """
-    game_name_tag = game_node.find('a', attrs={'class': 'names'})
-    game_name = game_name_tag.text.strip()
-    home, away = [x.strip() for x in game_name.split('-')]
-
-    game_datetime_node = game_node.find('span', attrs={'class': 'datetime'})
-    datetime_str = game_datetime_node.contents[0].strip()
-    datetime_str_2 = datetime_str.replace('. ', '.'+str(datetime.today().year)+' ')
-    game_datetime = datetime.strptime(datetime_str_2, '%d.%m.%Y %H:%M')
+    Parses date & time strings of multiple games at once (e.g. 22.11. 17:00 - current year assumed)
 
-    odds_node = game_node.find('div', attrs={'class': 'odds'})
-    return [{'home': home, 'away': away, 'game_datetime': game_datetime, **single_odds} \
-            for single_odds in parse_odds(odds_node)]
+    :param game_datetime_strs: list of date & time strings, one per each game
+    :return: array of dates & times of the games
+    """
+    year = str(datetime.today().year)
+    return pd.to_datetime(pd.Series(game_datetime_strs, dtype=object).str.replace('. ', '.' + year + ' ', regex=False),
+                          format='%d.%m.%Y %H:%M',
+                          cache=True).to_numpy()
 
 
-def parse_games(game_nodes: bs4.element.ResultSet) -> list:
+def parse_games(soup: bs4.BeautifulSoup) -> dict:
     """
-    Extracts all relevant info about multiple games: home&away teams, date&time, all quoted exact game results with odds
-    :param game_nodes: Set of html nodes, one per each game
-    :return: Flattened list with one item per each game&exact result pair
+    Extracts all relevant info about multiple games: home&away teams, date&time, all quoted exact game results with odds.
+    Each game's name, date&time and exact results with odds are looked up within its own node only
+    (first div.odds block of the game).
+    :param soup: Parsed html page with all the games
+    :return: A dictionary of columns (home, away, game_datetime, home_goals, away_goals, odds)
+    with one item per each game&exact result pair
     """
-    return [l for gn in game_nodes for l in parse_game(gn)]
-
+    columns = {'home': [],
+               'away': [],
+               'home_goals': array('b'),
+               'away_goals': array('b'),
+               'odds': array('d')}
+    # Date & time strings (one per game) are parsed all at once at the end and repeated for each row of the game
+    game_datetime_strs = []
+    game_num_rows = array('i')
+    for game_node in soup.find_all('div', attrs={'class': 'market-with-header'}):
+        home, away = parse_game_name(game_node.find('a', attrs={'class': 'names'}))
+        game_datetime_node = game_node.find('span', attrs={'class': 'datetime'})
+        if game_datetime_node is None:
+            raise ValueError(f'No date & time found for game {home} - {away}')
+        game_datetime_strs.append(game_datetime_node.contents[0].strip())
+        single_odds_nodes = game_node.find('div', attrs={'class': 'odds'}).find_all('a')
+        game_num_rows.append(len(single_odds_nodes))
+        for single_odds_node in single_odds_nodes:
+            home_goals, away_goals, odds = parse_single_odds(single_odds_node)
+            columns['home'].append(home)
+            columns['away'].append(away)
+            columns['home_goals'].append(home_goals)
+            columns['away_goals'].append(away_goals)
+            columns['odds'].append(odds)
 
+    columns['game_datetime'] = np.repeat(parse_game_datetimes(game_datetime_strs), np.asarray(game_num_rows))
+    # Typed buffers exposed as NumPy arrays (no copy), so pandas takes them as columns without inferring dtypes
+    columns['home_goals'] = np.asarray(columns['home_goals'], dtype=np.int8)
+    columns['away_goals'] = np.asarray(columns['away_goals'], dtype=np.int8)
+    columns['odds'] = np.asarray(columns['odds'])
+    return columns